@@ -4,34 +4,18 @@ import json
 import re
 from abc import ABC, abstractmethod
 import google.generativeai as genai
+import deadline
+from answer_parser import parse_ai_response, strip_question_number
 
 # --- Prompt Engineering ---
-def build_prompt(instruction: str, questions: list, options: list, blank_counts: list) -> str:
-    """Builds the standardized prompt to be sent to the AI."""
-    cleaned_questions = [re.sub(r"^\d+\.\s*", "", q).strip() for q in questions]
-    questions_block = "\n".join([f"{i+1}. {q}" for i, q in enumerate(cleaned_questions)])
-    options_block = ", ".join(options)
-    
-    prompt = f"""
+PROMPT_HEADER = """
 You are an expert English test-solver. Your task is to solve a fill-in-the-blanks quiz.
 Analyze the instruction, the questions, and the provided word bank carefully.
 Place the most appropriate word or phrase from the options into each blank.
 
 **Instruction:**
-{instruction}
-
-**Questions:**
-{questions_block}
-
-**Word Bank:**
-{options_block}
 """
-    if blank_counts:
-        prompt += "\n**Structure:**\n"
-        for i, count in enumerate(blank_counts):
-            prompt += f"Question {i+1} has {count} blank(s).\n"
-            
-    prompt += """
+PROMPT_FOOTER = """
 **Output Format:**
 You MUST provide ONLY the answers, without any explanation or pleasantries.
 Follow this format strictly, separating answers for multiple blanks with a pipe character (|).
@@ -41,31 +25,83 @@ ANSWERS:
 2. word2|word3
 3. word4
 """
+
+def build_prompt(instruction: str, questions: list, options: list, blank_counts: list) -> str:
+    """Builds the standardized prompt to be sent to the AI."""
+    parts = [PROMPT_HEADER, instruction, "\n\n**Questions:**\n"]
+    parts.extend(f"{i}. {strip_question_number(q)}\n" for i, q in enumerate(questions, 1))
+    parts += ["\n**Word Bank:**\n", ", ".join(options), "\n"]
+    if blank_counts:
+        parts.append("\n**Structure:**\n")
+        parts.extend(f"Question {i} has {count} blank(s).\n" for i, count in enumerate(blank_counts, 1))
+    parts.append(PROMPT_FOOTER)
+    return "".join(parts)
+
+# --- Chunked Translation ---
+SENTENCE_BOUNDARY = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+")
+LEADING_PUNCTUATION = "\"'([“‘"
+TRAILING_PUNCTUATION = "\"')]”’"
+# Abbreviations whose period does not end a sentence (matched case-sensitively, without the final period).
+ABBREVIATIONS = {"Mr", "Mrs", "Ms", "Dr", "Prof", "St", "Mt", "Jr", "Sr", "vs", "e.g", "i.e", "U.S", "U.K", "Fig", "Vol", "pp"}
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate for English text (about 4 characters per token)."""
+    return len(text) // 4 + 1
+
+def _is_abbreviation(word: str) -> bool:
+    """True for a known abbreviation ("Dr.", "e.g.") or a capital-letter initial ("J."), whose period does not end a sentence."""
+    word = word.lstrip(LEADING_PUNCTUATION).rstrip(TRAILING_PUNCTUATION)
+    if not word.endswith("."): return False
+    core = word[:-1]
+    return core in ABBREVIATIONS or (len(core) == 1 and core.isupper())
+
+def split_sentences(paragraph: str) -> list:
+    """Splits a paragraph at sentence ends, skipping periods that follow abbreviations or initials."""
+    sentences, start = [], 0
+    for boundary in SENTENCE_BOUNDARY.finditer(paragraph):
+        words = paragraph[start:boundary.start()].split()
+        if not words or _is_abbreviation(words[-1]): continue
+        sentences.append(paragraph[start:boundary.start()]); start = boundary.end()
+    sentences.append(paragraph[start:])
+    return sentences
+
+def split_into_chunks(text: str, max_tokens: int) -> list:
+    """Splits a passage into sentence-aligned chunks of at most max_tokens each.
+
+    Returns a list of (paragraph_index, chunk_text) tuples in reading order; a chunk never
+    spans two paragraphs, and a single sentence longer than the budget becomes its own chunk.
+    """
+    chunks = []
+    paragraphs = [p.strip() for p in text.splitlines() if p.strip()]
+    for p_index, paragraph in enumerate(paragraphs):
+        current, current_tokens = [], 0
+        for sentence in split_sentences(paragraph):
+            sentence_tokens = estimate_tokens(sentence)
+            if current and current_tokens + sentence_tokens > max_tokens:
+                chunks.append((p_index, " ".join(current)))
+                current, current_tokens = [], 0
+            current.append(sentence); current_tokens += sentence_tokens
+        if current: chunks.append((p_index, " ".join(current)))
+    return chunks
+
+def build_translation_prompt(chunks: list, index: int) -> str:
+    """Builds the prompt for one chunk, with its neighbours as shared context for consistent terminology."""
+    before = chunks[index - 1][1] if index > 0 else ""
+    after = chunks[index + 1][1] if index + 1 < len(chunks) else ""
+    prompt = "Please translate the English text marked TRANSLATE into Chinese. Provide ONLY the Chinese translation of that text.\n"
+    if before or after:
+        prompt += "The CONTEXT parts come from the same passage; use them only to keep the meaning and terminology consistent and do NOT translate them.\n"
+    if before: prompt += f"\nCONTEXT (preceding):\n{before}\n"
+    prompt += f"\nTRANSLATE:\n{chunks[index][1]}\n"
+    if after: prompt += f"\nCONTEXT (following):\n{after}\n"
     return prompt
 
-def parse_ai_response(response_text: str) -> list:
-    """Parses the raw text from the AI to extract a list of answers."""
-    try:
-        if not response_text:
-            return []
-        
-        # Isolate the core answer block
-        if "ANSWERS:" in response_text:
-            response_text = response_text.split("ANSWERS:", 1)[1].strip()
-            
-        lines = response_text.splitlines()
-        answers = []
-        
-        for line in lines:
-            line = line.strip()
-            if re.match(r"^\d+\.\s*", line):
-                content = re.sub(r"^\d+\.\s*", "", line).strip()
-                multi_answers = [ans.strip() for ans in content.split("|")]
-                answers.append(multi_answers)
-        return answers
-    except Exception as e:
-        print(f"Error parsing AI response: {e}")
-        return []
+def join_translations(chunks: list, translations: list) -> str:
+    """Reassembles translated chunks in order, restoring the original paragraph breaks."""
+    paragraphs = {}
+    for (p_index, _), translation in zip(chunks, translations):
+        paragraphs.setdefault(p_index, []).append(translation.strip())
+    return "\n".join("".join(parts) for _, parts in sorted(paragraphs.items()))
 
 # --- AI Provider Abstraction ---
 class BaseAIProvider(ABC):
@@ -90,8 +126,9 @@ class DashScopeProvider(BaseAIProvider):
             "parameters": {"result_format": "text"}
         }
         headers = { "Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json" }
+        timeout = deadline.timeout(30)  # 在try之外计算：预算耗尽时让DeadlineExceeded直接抛出，而不是变成错误字符串
         try:
-            response = requests.post("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation", headers=headers, data=json.dumps(payload), timeout=30)
+            response = requests.post("https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation", headers=headers, data=json.dumps(payload), timeout=timeout)
             response.raise_for_status()
             return response.json()['output']['text']
         except Exception as e: return f"Error calling DashScope: {e}"
@@ -103,8 +140,9 @@ class GeminiProvider(BaseAIProvider):
         genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel('gemini-pro')
     def call_ai(self, prompt: str) -> str:
+        timeout = deadline.timeout(30)
         try:
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(prompt, request_options={"timeout": timeout})
             return response.text
         except Exception as e: return f"Error calling Gemini: {e}"
 
@@ -113,8 +151,9 @@ class DeepSeekProvider(BaseAIProvider):
     def call_ai(self, prompt: str) -> str:
         payload = {"model": "deepseek-chat", "messages": [{"role": "user", "content": prompt}], "temperature": 0.1}
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        timeout = deadline.timeout(30)
         try:
-            response = requests.post("https://api.deepseek.com/chat/completions", headers=headers, data=json.dumps(payload), timeout=30)
+            response = requests.post("https://api.deepseek.com/chat/completions", headers=headers, data=json.dumps(payload), timeout=timeout)
             response.raise_for_status()
             return response.json()['choices'][0]['message']['content']
         except Exception as e: return f"Error calling DeepSeek: {e}"
@@ -124,8 +163,9 @@ class ZhipuAIProvider(BaseAIProvider):
     def call_ai(self, prompt: str) -> str:
         payload = {"model": "glm-4-flash", "messages": [{"role": "user", "content": prompt}]}
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        timeout = deadline.timeout(30)
         try:
-            response = requests.post("https://open.bigmodel.cn/api/paas/v4/chat/completions", headers=headers, data=json.dumps(payload), timeout=30)
+            response = requests.post("https://open.bigmodel.cn/api/paas/v4/chat/completions", headers=headers, data=json.dumps(payload), timeout=timeout)
             response.raise_for_status()
             return response.json()['choices'][0]['message']['content']
         except Exception as e: return f"Error calling Zhipu AI: {e}"
@@ -135,8 +175,9 @@ class GroqProvider(BaseAIProvider):
     def call_ai(self, prompt: str) -> str:
         payload = {"model": "llama3-8b-8192", "messages": [{"role": "user", "content": prompt}], "temperature": 0.1}
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+        timeout = deadline.timeout(30)
         try:
-            response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, data=json.dumps(payload), timeout=30)
+            response = requests.post("https://api.groq.com/openai/v1/chat/completions", headers=headers, data=json.dumps(payload), timeout=timeout)
             response.raise_for_status()
             return response.json()['choices'][0]['message']['content']
         except Exception as e: return f"Error calling Groq: {e}"
@@ -0,0 +1,113 @@
+# File: answer_index.py
+import re, difflib
+import answer_parser
+
+PUNCTUATION = re.compile(r"[^\w\s'-]+")
+OPTION_LABEL = re.compile(r"^\(?([A-Oa-o])[.)、]\s*")  # 词库条目前的 "A. " / "(b)" 等编号
+INFLECTIONS = (("ies", "y"), ("ied", "y"), ("ing", ""), ("ed", ""), ("es", ""), ("s", ""))
+ADVERB_SUFFIX = ("ly", "")  # 只用于答案；词库条目本身可能以 -ly 结尾（apply、supply），不能再削掉
+
+def normalize(text: str) -> str:
+    """统一大小写、去掉标点和多余空白。"""
+    return " ".join(PUNCTUATION.sub(" ", text.casefold()).split())
+
+def _stem_word(word: str, adverbs: bool = True) -> str:
+    for suffix, replacement in INFLECTIONS + ((ADVERB_SUFFIX,) if adverbs else ()):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement; break
+    if word.endswith("e"): word = word[:-1]
+    if len(word) > 2 and word[-1] == word[-2] and word[-1] not in "aeiou": word = word[:-1]  # stopped -> stop
+    return word
+
+def stem(text: str, adverbs: bool = True) -> str:
+    """粗略的词形还原（逐词去掉常见屈折后缀），用于把 abandoned / abandons 归到 abandon。"""
+    return " ".join(_stem_word(w, adverbs) for w in normalize(text).split())
+
+class WordBankIndex:
+    """选词填空的词库索引：在填写之前就把AI答案与页面提取到的词库比对，纠正或标记不在词库中的答案。"""
+    def __init__(self, options: list):
+        self.entries, self.by_label, self.exact, self.stems = [], {}, {}, {}
+        for option in options:
+            label = OPTION_LABEL.match(option)
+            entry = option[label.end():].strip() if label else option.strip()
+            if not entry: continue
+            self.entries.append(entry)
+            if label: self.by_label[label.group(1).upper()] = entry
+            self.exact.setdefault(normalize(entry), entry)
+            self.stems.setdefault(stem(entry, adverbs=False), entry)
+
+    def resolve(self, answer: str):
+        """
+        返回 (要填写的文本, 状态)。状态为 'ok'（是词库条目或其变形，保留AI给出的词形）、
+        'fixed'（按选项编号或拼写相近纠正为词库条目）或 'unknown'（未匹配，原样保留）。
+        """
+        cleaned = answer.strip().strip("\"'“”‘’`*")
+        label = OPTION_LABEL.match(cleaned)
+        if label and normalize(cleaned[label.end():]) in self.exact: cleaned = cleaned[label.end():].strip()
+        key = normalize(cleaned)
+        if key in self.exact: return cleaned, 'ok' if cleaned == answer else 'fixed'
+        if stem(cleaned) in self.stems: return cleaned, 'ok' if cleaned == answer else 'fixed'  # 题目常要求"必要时变换词形"
+        if len(cleaned) == 1 and cleaned in self.by_label: return self.by_label[cleaned], 'fixed'  # 只有大写单字母才视为选项编号
+        close = difflib.get_close_matches(key, self.exact, n=1, cutoff=0.8)
+        if close: return self.exact[close[0]], 'fixed'
+        return answer, 'unknown'
+
+    def validate(self, answers: list, blank_counts: list = None):
+        """校验全部答案，返回 (修正后的答案, 问题说明列表)。词库为空时不做词库比对，只检查空数。"""
+        fixed_answers, problems = [], []
+        for i, group in enumerate(answers):
+            expected = blank_counts[i] if blank_counts and i < len(blank_counts) else None
+            if expected and len(group) != expected:
+                problems.append(f"第 {i+1} 题需要 {expected} 个答案，AI给出了 {len(group)} 个。")
+            if not self.entries: fixed_answers.append(group); continue
+            fixed_group = []
+            for answer in group:
+                value, status = self.resolve(answer)
+                if status == 'fixed': problems.append(f"第 {i+1} 题答案 '{answer}' 已纠正为词库中的 '{value}'。")
+                elif status == 'unknown': problems.append(f"第 {i+1} 题答案 '{answer}' 不在词库中。")
+                fixed_group.append(value)
+            fixed_answers.append(fixed_group)
+        return fixed_answers, problems
+
+# 一次往返取回每道题的选项：[[字母, 选项文本, 可点击元素], ...]
+# 只认 "A." / "(B)" / "C、" 这类带分隔符的编号或单独的字母，避免把 "A recent study..." 这样的题干当成选项A；
+# 优先在选项容器内查找，同一字母多次命中时取最内层（嵌套时）或最后一个元素。
+CHOICE_OPTIONS_SCRIPT = r"""
+return arguments[0].map(function (question) {
+    var found = {}, order = [];
+    var candidates = question.querySelectorAll('[class*="option"] span, [class*="option"] label, [class*="choice"] span, [class*="choice"] label');
+    if (!candidates.length) candidates = question.querySelectorAll('span, label');
+    candidates.forEach(function (el) {
+        var m = el.textContent.trim().match(/^\(?([A-H])(?:[.)、．]\s*([\s\S]*)|\)?)$/);
+        if (!m) return;
+        var previous = found[m[1]];
+        if (previous && el.contains(previous)) return;
+        if (!previous) order.push(m[1]);
+        found[m[1]] = el; el._optionText = (m[2] || '').trim();
+    });
+    return order.map(function (letter) { return [letter, found[letter]._optionText, found[letter]]; });
+});
+"""
+
+class ChoiceIndex:
+    """选择题索引：题号 -> {选项字母: (选项文本, DOM元素)}，用于在点击前校验AI给出的字母。"""
+    def __init__(self, options_per_question: list):
+        self.questions = [{letter: (text, element) for letter, text, element in options} for options in options_per_question]
+
+    @classmethod
+    def build(cls, driver, question_elements: list):
+        return cls(driver.execute_script(CHOICE_OPTIONS_SCRIPT, question_elements) or [])
+
+    def has_options(self, index: int) -> bool: return index < len(self.questions) and bool(self.questions[index])
+
+    def resolve(self, index: int, raw_answer: str):
+        """返回 (字母, 要点击的元素)。字母不存在时尝试按选项文本模糊匹配；无法确定时元素为None。"""
+        options = self.questions[index] if index < len(self.questions) else {}
+        letters = answer_parser.parse_choice_letters(raw_answer)
+        letter = letters[0] if letters else None
+        if letter in options: return letter, options[letter][1]
+        if options and raw_answer:
+            texts = {normalize(text): l for l, (text, _) in options.items() if text}
+            close = difflib.get_close_matches(normalize(raw_answer), texts, n=1, cutoff=0.6)
+            if close: return texts[close[0]], options[texts[close[0]]][1]
+        return letter, None
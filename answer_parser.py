@@ -0,0 +1,80 @@
+# File: answer_parser.py
+import re, json
+
+# --- Precompiled patterns ---
+QUESTION_NUMBER = re.compile(r"^\d+\.\s*")
+# One line of an AI answer: optional "1. " / "1.word" / "1) " / "Question 1: " prefix, then the content.
+# A bare number needs "." / ")" / "、" right after it (many models print "1.word" with no space), and
+# "Question N" needs whitespace after its separator, so "1990: ...", "10:30 ..." and "1.5 km" stay plain text.
+ANSWER_LINE = re.compile(r"^\s*(?:question\s*(\d{1,3})\s*[.):：]\s+|(\d{1,3})(?:[)、]|\.(?!\d))\s*)?(.*?)\s*$", re.IGNORECASE)
+# A choice letter on its own, or wrapped like "(B)", "B.", "B)", "Answer: B", "B - because ...".
+CHOICE_LETTER = re.compile(r"^(?:answer\s*[:：]?\s*)?\(?([A-Ha-h])\b(?:[.):：]|\s|$)", re.IGNORECASE)
+TRUE_FALSE_WORD = re.compile(r"^(true|false|not\s+given)\b", re.IGNORECASE)
+TRUE_FALSE_LETTERS = {"true": "A", "false": "B", "not given": "C"}
+
+def _json_payload(text: str):
+    """Returns the decoded JSON answers when the response is a JSON list / {"answers": [...]} object, else None."""
+    start = text.find("[") if text.lstrip().startswith("[") else text.find("{")
+    if start < 0: return None
+    try: payload = json.loads(text[start:text.rfind("]" if text[start] == "[" else "}") + 1])
+    except ValueError: return None
+    if isinstance(payload, dict): payload = payload.get("answers", payload.get("ANSWERS"))
+    return payload if isinstance(payload, list) else None
+
+def tokenize(response_text: str, bare_fallback: bool = False) -> list:
+    """One-pass tokenizer: returns the answer items of a response in order, as strings.
+
+    Handles numbered lines ("1. word", "2) a|b", "Question 3: B") and JSON (a list, or an object
+    with an "answers" list). Anything before an "ANSWERS:" marker is ignored and un-numbered lines
+    are dropped; with bare_fallback, a response without any numbered line yields its bare lines instead.
+    """
+    if not response_text: return []
+    marker = response_text.find("ANSWERS:")
+    if marker >= 0: response_text = response_text[marker + 8:]
+    payload = _json_payload(response_text)
+    if payload is not None:
+        return ["|".join(map(str, item)) if isinstance(item, list) else str(item) for item in payload]
+    numbered, bare = [], []
+    for line in response_text.splitlines():
+        question_number, number, content = ANSWER_LINE.match(line).groups()
+        if not content or content.startswith("```"): continue
+        (numbered if question_number or number else bare).append(content)
+    return numbered or (bare if bare_fallback else [])
+
+def parse_ai_response(response_text: str) -> list:
+    """Parses the raw text from the AI into a list of answer groups (one list of blanks per question)."""
+    try:
+        return [[ans.strip() for ans in item.split("|")] for item in tokenize(response_text)]
+    except Exception as e:
+        print(f"Error parsing AI response: {e}")
+        return []
+
+def parse_choice_letters(response_text: str, count: int = None) -> list:
+    """Parses choice answers into upper-case letters, one per question; items that are not a letter become None.
+
+    "True" / "False" / "Not Given" are mapped to A / B / C so true-false prompts tolerate worded answers.
+    """
+    letters = []
+    for item in tokenize(response_text, bare_fallback=True):
+        match = CHOICE_LETTER.match(item)
+        if match: letters.append(match.group(1).upper()); continue
+        word = TRUE_FALSE_WORD.match(item)
+        letters.append(TRUE_FALSE_LETTERS[" ".join(word.group(1).lower().split())] if word else None)
+    return letters if count is None else letters[:count]
+
+def strip_question_number(question: str) -> str:
+    return QUESTION_NUMBER.sub("", question, count=1).strip()
+
+if __name__ == "__main__":
+    # Micro-benchmark: python answer_parser.py [iterations]
+    import sys, timeit
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    samples = {
+        "numbered": "Sure, here you go.\nANSWERS:\n" + "\n".join(f"{i}. word{i}|other{i}" for i in range(1, 11)),
+        "lettered": "\n".join(f"{i}. {'ABC'[i % 3]}" for i in range(1, 11)),
+        "json": json.dumps({"answers": [[f"word{i}", f"other{i}"] for i in range(10)]}),
+    }
+    for name, text in samples.items():
+        for func in (parse_ai_response, parse_choice_letters):
+            seconds = timeit.timeit(lambda: func(text), number=iterations)
+            print(f"{name:>9} {func.__name__:<22} {iterations / seconds:>12,.0f} responses/s")
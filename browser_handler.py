@@ -10,6 +10,7 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException
 from driver_manager import WebDriverManager
+import deadline
 from tkinter import messagebox
 
 def is_port_in_use(port: int) -> bool:
@@ -118,7 +119,7 @@ def check_and_navigate(driver, target_url="https://ucloud.unipus.cn/"):
 def extract_questions_from_page(driver):
     """从网页中提取指令、问题和选项。"""
     data = {"instruction": "", "questions": [], "options": []}
-    wait = WebDriverWait(driver, 10)
+    wait = WebDriverWait(driver, deadline.timeout(10))
     try:
         instruction_element = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.instruction p, div.direction-text p')))
         data["instruction"] = instruction_element.text.strip()
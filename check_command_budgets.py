@@ -0,0 +1,193 @@
+# File: check_command_budgets.py
+"""
+WebDriver命令预算检查：用模拟的driver和页面重放每个任务处理器，统计单页发出的命令数，
+超出 driver_metrics.COMMAND_BUDGETS 时以非零状态退出。
+不需要浏览器、config.ini 和API Key；AI回答是预先写好的。用法: python check_command_budgets.py [-v]
+"""
+import sys, os, types, threading
+
+# 在导入处理器之前替换 config_manager：真实模块在缺少 config.ini 时会写文件并弹窗（无显示环境下直接报错），
+# 而且本地 [CommandBudgets] 的覆盖不能让检查放宽。这里只提供被导入模块用到的读取函数，全部返回默认值。
+sys.modules['config_manager'] = types.SimpleNamespace(
+    CURRENT_DIR=os.path.dirname(os.path.abspath(__file__)),
+    get_command_budget=lambda handler_name: None, get_api_key=lambda provider: "",
+    get_translate_chunk_tokens=lambda: 300, get_ai_max_workers=lambda: 4,
+    get_page_time_budget=lambda: 420, get_concurrent_windows=lambda: 0)
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.command import Command
+from selenium.common.exceptions import NoSuchElementException
+import answer_index, deadline, task_handlers
+from driver_metrics import DriverMetrics
+from profiler import RunProfiler
+
+QUESTION_COUNTS = (5, 20)  # 每类题目分别用少量和大量题目各跑一次，检查按题数计算的预算
+
+class StubElement:
+    """模拟的WebElement：和真实元素一样，每个操作都经由 driver.execute 发出一条命令。"""
+    def __init__(self, text="", children=None, **attributes):
+        self._text, self.children, self.attributes = text, children or {}, attributes
+        self.parent = None
+
+    def _command(self, command, **params):
+        return self.parent.execute(command, dict(params, id=id(self)))
+
+    @property
+    def text(self): self._command(Command.GET_ELEMENT_TEXT); return self._text
+    def click(self): self._command(Command.CLICK_ELEMENT)
+    def clear(self): self._command(Command.CLEAR_ELEMENT)
+    def send_keys(self, *value): self._command(Command.SEND_KEYS_TO_ELEMENT, text="".join(value))
+    def get_attribute(self, name): self._command(Command.W3C_EXECUTE_SCRIPT); return self.attributes.get(name)  # Selenium 4 用脚本读属性
+    def is_displayed(self): self._command(Command.W3C_EXECUTE_SCRIPT); return True
+    def is_enabled(self): self._command(Command.IS_ELEMENT_ENABLED); return True
+
+    def find_elements(self, by=By.ID, value=None):
+        self._command(Command.FIND_CHILD_ELEMENTS, using=by, value=value)
+        return self.parent.adopt(self.children.get(value, []))
+
+    def find_element(self, by=By.ID, value=None):
+        self._command(Command.FIND_CHILD_ELEMENT, using=by, value=value)
+        found = self.parent.adopt(self.children.get(value, []))
+        if not found: raise NoSuchElementException(value)
+        return found[0]
+
+class StubDriver:
+    """模拟的WebDriver：按定位器返回页面上的模拟元素，按脚本返回预设结果。"""
+    def __init__(self, page):
+        self.page = page
+        self.switch_to = types.SimpleNamespace(
+            frame=lambda frame: self.execute(Command.SWITCH_TO_FRAME, {'id': frame}),
+            default_content=lambda: self.execute(Command.SWITCH_TO_FRAME, {'id': None}))
+
+    def execute(self, driver_command, params=None): return {'value': None}
+
+    def adopt(self, elements):
+        for element in elements: element.parent = self
+        return list(elements)
+
+    @property
+    def current_url(self): self.execute(Command.GET_CURRENT_URL); return "https://ucontent.unipus.cn/stub"
+
+    @property
+    def timeouts(self): self.execute(Command.GET_TIMEOUTS); return types.SimpleNamespace(script=30)
+    def set_script_timeout(self, seconds): self.execute(Command.SET_TIMEOUTS, {'script': int(seconds * 1000)})
+
+    def find_elements(self, by=By.ID, value=None):
+        self.execute(Command.FIND_ELEMENTS, {'using': by, 'value': value})
+        return self.adopt(self.page['elements'].get(value, []))
+
+    def find_element(self, by=By.ID, value=None):
+        self.execute(Command.FIND_ELEMENT, {'using': by, 'value': value})
+        found = self.adopt(self.page['elements'].get(value, []))
+        if not found: raise NoSuchElementException(value)
+        return found[0]
+
+    def execute_script(self, script, *args):
+        self.execute(Command.W3C_EXECUTE_SCRIPT, {'script': script, 'args': args})
+        return self.page.get('script', lambda driver, script, args: None)(self, script, args)
+
+    def execute_async_script(self, script, *args):
+        self.execute(Command.W3C_EXECUTE_SCRIPT_ASYNC, {'script': script, 'args': args})
+        return self.page['async_script'](script, args)
+
+class StubProvider:
+    def __init__(self, answer): self.answer = answer
+    def call_ai(self, prompt): return self.answer(prompt)
+
+class StubGUI:
+    def __init__(self, verbose, metrics):
+        self.verbose, self.metrics, self.stop_flag, self.profiler = verbose, metrics, threading.Event(), RunProfiler(enabled=False)
+    def log(self, message):
+        if self.verbose: print(f"    {message}")
+    def show_ai_debug(self, prompt_text, response_text=None): pass
+
+# --- 各页面类型的模拟页面 ---
+SUBMIT_BUTTON = "//button[contains(span, '提交')]"
+QUESTION_ITEMS = "div.question-item, div.ques-item"
+
+def _choice_questions(letters, n):
+    return [StubElement(f"{i+1}. Statement {i+1}\n" + "\n".join(f"{letter}. option {letter}" for letter in letters)) for i in range(n)]
+
+def _choice_options(letters):
+    """CHOICE_OPTIONS_SCRIPT 的模拟结果：每道题每个选项一个可点击元素。"""
+    def script(driver, source, args):
+        if source is not answer_index.CHOICE_OPTIONS_SCRIPT: return None
+        return [[[letter, f"option {letter}", element] for letter in letters for element in driver.adopt([StubElement(letter)])] for _ in args[0]]
+    return script
+
+def _numbered(answer, n): return lambda prompt: "\n".join(f"{i+1}. {answer(i)}" for i in range(n))
+
+def video_page(n):
+    polls = iter(range(3))
+    def script(driver, source, args):
+        if 'currentTime' not in source: return None
+        return {'currentTime': 60.0, 'duration': 60.0, 'ended': True} if next(polls, 2) >= 2 else {'currentTime': 10.0, 'duration': 60.0, 'ended': False}
+    return {'elements': {"iframe": [StubElement()], "video": [StubElement()]}, 'script': script}
+
+def flashcards_page(n):
+    total = n * 5
+    position = {'current': 1}
+    def async_script(source, args):
+        position['current'] = min(total, position['current'] + args[2])
+        return {'current': position['current'], 'total': total, 'error': None}
+    return {'elements': {"//span[text()='下一条']/parent::button": [StubElement("下一条")]}, 'async_script': async_script}
+
+def true_false_page(n):
+    questions = _choice_questions("ABC", n)
+    return {'elements': {"div.question-list, div.ques-list": [StubElement(children={QUESTION_ITEMS: questions})], SUBMIT_BUTTON: [StubElement("提交")]},
+            'script': _choice_options("ABC"), 'answer': _numbered(lambda i: "ABC"[i % 3], n)}
+
+def fill_in_blank_page(n):
+    paragraphs = [StubElement(f"{i+1}. The word ____ fits here.", children={"input": [StubElement()]}) for i in range(n)]
+    bank = [StubElement(f"{chr(65 + i % 26)}. word{i}") for i in range(n)]
+    return {'elements': {
+                'div.instruction p, div.direction-text p': [StubElement("Fill in the blanks with the words given.")],
+                'div.questions-wrapper, div.ques-wrapper': [StubElement(children={"p": paragraphs})],
+                'div.word-bank div.option, div.word-bank-item': bank,
+                '//div[contains(@class, "questions-wrapper")]//p | //div[contains(@class, "ques-wrapper")]//p': paragraphs},
+            'answer': _numbered(lambda i: f"word{i}", n)}
+
+def vocabulary_choice_page(n):
+    return {'elements': {QUESTION_ITEMS: _choice_questions("AB", n), SUBMIT_BUTTON: [StubElement("提交")]},
+            'script': _choice_options("AB"), 'answer': _numbered(lambda i: "AB"[i % 2], n)}
+
+def rewrite_sentence_page(n):
+    questions = [StubElement(children={"div.stem": [StubElement(f"Sentence {i+1} is not parallel.")], "textarea": [StubElement()]}) for i in range(n)]
+    return {'elements': {QUESTION_ITEMS: questions, SUBMIT_BUTTON: [StubElement("提交")]},
+            'answer': _numbered(lambda i: f"Sentence {i+1} is parallel.", n)}
+
+def translate_page(n):
+    paragraph = " ".join(f"This is sentence number {i+1} of the passage, and it is long enough to matter." for i in range(n * 4))
+    return {'elements': {"div.ql-editor, div.translate-area": [StubElement(f"{paragraph}\n{paragraph}")],
+                         "div.ql-editor": [StubElement()], SUBMIT_BUTTON: [StubElement("提交")]},
+            'answer': lambda prompt: "这是一段译文。"}
+
+PAGES = {
+    "VIDEO": video_page, "VOCABULARY_FLASHCARDS": flashcards_page,
+    "QUIZ_TRUE_FALSE_NG": true_false_page, "QUIZ_FILL_IN_BLANK": fill_in_blank_page,
+    "QUIZ_VOCABULARY_CHOICE": vocabulary_choice_page, "QUIZ_REWRITE_SENTENCE": rewrite_sentence_page,
+    "QUIZ_TRANSLATE": translate_page,
+    "READING": lambda n: {'elements': {}}, "REPEATING_AFTER_ME": lambda n: {'elements': {}}, "UNIT_PROJECT": lambda n: {'elements': {}},
+}
+
+def main(verbose=False) -> int:
+    # 只统计命令数，不需要真的等待
+    deadline.sleep = lambda seconds: deadline.timeout(seconds)
+    task_handlers.time = types.SimpleNamespace(time=task_handlers.time.time, sleep=lambda seconds: None)
+    metrics = DriverMetrics(); gui = StubGUI(verbose, metrics)
+    for n in QUESTION_COUNTS:
+        for page_type, handler in task_handlers.HANDLER_REGISTRY.items():
+            page = PAGES[page_type](n)
+            task_handlers.get_provider = lambda gui, answer=page.get('answer'): StubProvider(answer or (lambda prompt: ""))
+            driver = metrics.attach(StubDriver(page))
+            if verbose: print(f"{handler.__name__} [{page_type}] x{n}")
+            with deadline.page_budget(60), metrics.track(handler.__name__, page_type):
+                result = handler(driver, gui)
+            if result is False: print(f"警告：{handler.__name__} 认为模拟的 {page_type} 页面类型不符，模拟页面需要更新。")
+    for line in metrics.summary_lines(): print(line)
+    violations = metrics.budget_violations()
+    print(f"{len(violations)} 个处理器超出命令预算。" if violations else "所有处理器都在命令预算之内。")
+    return 1 if violations else 0
+
+if __name__ == "__main__":
+    sys.exit(main(verbose='-v' in sys.argv[1:]))
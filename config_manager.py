@@ -22,6 +22,12 @@ def create_default_config():
         'zhipuai_api_key': 'YOUR_ZHIPUAI_API_KEY_HERE',
         'groq_api_key': 'YOUR_GROQ_API_KEY_HERE'
     }
+    config['Performance'] = {
+        'translate_chunk_tokens': '300',
+        'ai_max_workers': '4',
+        'page_time_budget': '420',
+        'concurrent_windows': '0'
+    }
     with open(CONFIG_PATH, 'w', encoding='utf-8') as f: config.write(f)
     tkinter.messagebox.showwarning("Configuration Created", f"config.ini已创建，请在其中填入你的登录信息和API密钥。")
 
@@ -39,4 +45,13 @@ def get_credentials():
     return username, password
 
 def get_chrome_exe_path(): return config.get('Paths', 'chrome_executable_path', fallback='').strip()
-def get_api_key(p: str): return config.get('API_Keys', f"{p.lower()}_api_key", fallback='')
\ No newline at end of file
+def get_api_key(p: str): return config.get('API_Keys', f"{p.lower()}_api_key", fallback='')
+def get_translate_chunk_tokens(): return config.getint('Performance', 'translate_chunk_tokens', fallback=300)
+def get_page_time_budget(): return config.getfloat('Performance', 'page_time_budget', fallback=420)
+def get_concurrent_windows(): return max(0, config.getint('Performance', 'concurrent_windows', fallback=0))
+def get_ai_max_workers(): return max(1, config.getint('Performance', 'ai_max_workers', fallback=4))
+def get_command_budget(handler_name: str):
+    """读取 [CommandBudgets] 中为某个处理器配置的单页命令上限，格式为 "基数" 或 "基数 + 每题命令数"；未配置时返回None。"""
+    base, _, per_item = config.get('CommandBudgets', handler_name, fallback='').replace(' ', '').partition('+')
+    if not base.isdigit() or (per_item and not per_item.isdigit()): return None
+    return int(base), int(per_item or 0)
\ No newline at end of file
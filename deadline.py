@@ -0,0 +1,49 @@
+# File: deadline.py
+import time, threading
+from contextlib import contextmanager
+
+class DeadlineExceeded(Exception):
+    """当前页面的时间预算已经用完。"""
+
+class Deadline:
+    """单个页面的总时间预算；嵌套的等待、HTTP请求和重试都从剩余时间中扣除。"""
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float: return max(self.expires_at - time.monotonic(), 0.0)
+    def expired(self) -> bool: return time.monotonic() >= self.expires_at
+
+_local = threading.local()
+
+def current():
+    """返回当前线程正在使用的预算，没有时返回None。"""
+    return getattr(_local, 'deadline', None)
+
+@contextmanager
+def use(deadline):
+    """在当前线程中启用给定的预算（线程池中的子任务可用它继承父任务的预算）。"""
+    previous = current(); _local.deadline = deadline
+    try: yield deadline
+    finally: _local.deadline = previous
+
+def page_budget(seconds: float):
+    """为一个页面开启新的时间预算。"""
+    return use(Deadline(seconds))
+
+def timeout(default: float) -> float:
+    """返回 min(default, 剩余预算)，供 WebDriverWait、requests 等作为超时参数；预算已耗尽时抛出 DeadlineExceeded。"""
+    deadline = current()
+    if deadline is None: return default
+    remaining = deadline.remaining()
+    if remaining <= 0: raise DeadlineExceeded(f"页面时间预算 {deadline.seconds:.0f}s 已用完")
+    return min(default, remaining)
+
+def check():
+    """预算已耗尽时抛出 DeadlineExceeded；用于区分"等待被预算截断"和"页面上确实没有该元素"。"""
+    deadline = current()
+    if deadline is not None and deadline.expired(): raise DeadlineExceeded(f"页面时间预算 {deadline.seconds:.0f}s 已用完")
+
+def sleep(seconds: float):
+    """不超过剩余预算的 time.sleep。"""
+    time.sleep(timeout(seconds))
@@ -0,0 +1,104 @@
+# File: driver_metrics.py
+import time, threading, collections
+from contextlib import contextmanager
+import config_manager
+
+# 每个处理器处理单个页面允许的WebDriver命令数上限：(基数, 每题命令数)，单页预算 = 基数 + 每题命令数 × 题数。
+# 题数由处理器通过 DriverMetrics.count_items 报告；数值按 check_command_budgets.py 的实测成本留少量余量。
+# 可在 config.ini 的 [CommandBudgets] 中按处理器名覆盖。
+COMMAND_BUDGETS = {
+    "handle_skip_page": (0, 0),
+    "handle_unknown_page": (0, 0),
+    "handle_video_page": (200, 0),  # 2秒一次的进度轮询，长视频最多约150次
+    "handle_vocabulary_flashcards": (25, 0),  # 每批最多翻20张卡片的异步脚本，外加读取/恢复脚本超时
+    "handle_quiz_true_false": (10, 2),  # 每题读题干、点一次选项
+    "handle_quiz_fill_in_blank": (15, 9),  # 每题读两次文本、数空、清空并填写，外加词库条目
+    "handle_quiz_vocabulary_choice": (10, 2),
+    "handle_quiz_rewrite_sentence": (8, 4),  # 每题找题干、读题干、找输入框、填写
+    "handle_quiz_translate": (10, 0),
+}
+NAVIGATION_KEY = ("导航与页面识别", "-")
+
+class DriverMetrics:
+    """WebDriver往返统计：按处理器和页面类型累计命令数与通信耗时，并检查单页命令预算。"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = collections.OrderedDict()
+            self._violations = []
+
+    def attach(self, driver):
+        """在driver实例上挂钩execute；元素上的命令最终也经由driver.execute发出，因此同样会被统计。"""
+        if getattr(driver, '_metrics_attached', False): return driver
+        original_execute = driver.execute
+        def execute(driver_command, params=None):
+            start = time.perf_counter()
+            try: return original_execute(driver_command, params)
+            finally: self._record(driver_command, time.perf_counter() - start)
+        driver.execute = execute; driver._metrics_attached = True
+        return driver
+
+    def _entry(self, key):
+        return self._stats.setdefault(key, {'pages': 0, 'commands': 0, 'wire': 0.0, 'max_commands': 0, 'by_command': collections.Counter()})
+
+    def _record(self, command, elapsed):
+        page = getattr(self._local, 'page', None)
+        key = page['key'] if page else NAVIGATION_KEY
+        with self._lock:
+            entry = self._entry(key)
+            entry['commands'] += 1; entry['wire'] += elapsed; entry['by_command'][command] += 1
+        if page: page['commands'] += 1
+
+    @contextmanager
+    def track(self, handler_name: str, page_type: str):
+        """统计一次处理器调用（一个页面）内发出的命令，结束时与预算比较。"""
+        page = {'key': (handler_name, page_type), 'commands': 0, 'items': 0}
+        self._local.page = page
+        try:
+            yield page
+        finally:
+            self._local.page = None
+            budget = get_command_budget(handler_name, page['items'])
+            with self._lock:
+                entry = self._entry(page['key'])
+                entry['pages'] += 1; entry['max_commands'] = max(entry['max_commands'], page['commands'])
+                if budget is not None and page['commands'] > budget:
+                    self._violations.append((handler_name, page_type, page['commands'], budget))
+
+    def count_items(self, items: int):
+        """处理器报告当前页面的题目数，用于按题数计算命令预算；不在统计中时忽略。"""
+        page = getattr(self._local, 'page', None)
+        if page: page['items'] = items
+
+    def budget_violations(self) -> list:
+        """返回 (处理器名, 页面类型, 实际命令数, 预算) 列表。"""
+        with self._lock: return list(self._violations)
+
+    def summary_lines(self) -> list:
+        """生成运行摘要中的WebDriver往返统计部分。"""
+        with self._lock:
+            stats = [(key, dict(entry, by_command=entry['by_command'].copy())) for key, entry in self._stats.items()]
+            violations = list(self._violations)
+        if not stats: return []
+        lines = ["WebDriver 往返统计:"]
+        for (handler_name, page_type), entry in stats:
+            top = ", ".join(f"{cmd}x{n}" for cmd, n in entry['by_command'].most_common(3))
+            if entry['pages']:
+                lines.append(f"  {handler_name} [{page_type}]: {entry['pages']} 个页面, {entry['commands']} 条命令"
+                             f" (单页最多 {entry['max_commands']}), 通信 {entry['wire']:.2f}s | {top}")
+            else:
+                lines.append(f"  {handler_name}: {entry['commands']} 条命令, 通信 {entry['wire']:.2f}s | {top}")
+        for handler_name, page_type, commands, budget in violations:
+            lines.append(f"  警告：{handler_name} [{page_type}] 单页发出 {commands} 条命令，超出预算 {budget}。")
+        return lines
+
+def get_command_budget(handler_name: str, items: int = 0):
+    """计算处理器处理 items 道题时的命令预算；config.ini 中的设置优先，未配置的处理器返回None（不检查）。"""
+    budget = config_manager.get_command_budget(handler_name) or COMMAND_BUDGETS.get(handler_name)
+    if budget is None: return None
+    base, per_item = budget
+    return base + per_item * items
@@ -6,14 +6,22 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import TimeoutException, WebDriverException, NoSuchElementException
-import browser_handler, ai_handler, config_manager
-from page_analyzer import PageAnalyzer
+import browser_handler, ai_handler, config_manager, deadline
+from page_analyzer import PageAnalyzer, PageTypeCache
+from profiler import RunProfiler
+from driver_metrics import DriverMetrics
+from window_scheduler import WindowScheduler
 from task_handlers import *
 
 class AutoAnswerGUI:
-    def __init__(self, root):
+    def __init__(self, root, profile=False):
         self.root = root; self.root.title("U-Campus AI Agent - Final Architecture"); self.root.geometry("650x850")
         self.driver = None; self.stop_flag = threading.Event()
+        self.profiler = RunProfiler(enabled=profile)
+        self.metrics = DriverMetrics()
+        self.page_type_cache = PageTypeCache()
+        self.profile_enabled = tk.BooleanVar(value=profile)
+        self.profile_enabled.trace_add("write", lambda *_: setattr(self.profiler, 'enabled', self.profile_enabled.get()))
         main_frame = tk.Frame(root, padx=10, pady=10); main_frame.pack(fill=tk.BOTH, expand=True)
         self.create_text_boxes(main_frame); self.create_controls(main_frame); self.create_status_bar()
         self.log("欢迎使用终极AI代理！")
@@ -40,6 +48,7 @@ class AutoAnswerGUI:
         self.model_dropdown['values'] = list(ai_handler.AI_PROVIDERS.keys())
         self.model_dropdown.current(0)
         self.model_dropdown.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Checkbutton(controls_frame, text="性能分析", variable=self.profile_enabled).pack(side=tk.LEFT, padx=(5, 0))
         button_frame = tk.Frame(parent)
         button_frame.pack(fill=tk.X, pady=5)
         self.connect_button = tk.Button(button_frame, text="连接浏览器", command=self.start_browser_thread)
@@ -61,6 +70,15 @@ class AutoAnswerGUI:
         self.log_text.insert(tk.END, f"[{timestamp}] {message}\n"); self.log_text.see(tk.END)
         self.status_label.config(text=message); print(message)
 
+    def show_ai_debug(self, prompt_text, response_text=None):
+        """在“AI 交互详情”中显示Prompt，有回答时一并显示；可在任意线程调用。"""
+        self.root.after(0, self._ai_debug_update, prompt_text, response_text)
+
+    def _ai_debug_update(self, prompt_text, response_text):
+        self.ai_debug_text.delete(1.0, tk.END)
+        self.ai_debug_text.insert(tk.END, f"--- 发送给AI的Prompt ---\n{prompt_text}")
+        if response_text is not None: self.ai_debug_text.insert(tk.END, f"\n\n--- AI返回的原始回答 ---\n{response_text}")
+
     def start_browser_thread(self):
         self.log("正在启动浏览器连接线程..."); self.connect_button.config(state=tk.DISABLED)
         threading.Thread(target=self.connect_browser, daemon=True).start()
@@ -93,7 +111,14 @@ class AutoAnswerGUI:
     def run_automation_loop(self):
         # It correctly implements the two-layered navigation.
         if not self.driver: self.root.after(0, self.stop_automation); return
-        analyzer = PageAnalyzer(self.driver)
+        analyzer = PageAnalyzer(self.driver, self.page_type_cache)
+        self.profiler.attach_driver(self.driver)
+        self.metrics.attach(self.driver); self.metrics.reset()
+        handlers = {page_type: self.profiler.wrap_handler(handler) for page_type, handler in HANDLER_REGISTRY.items()}
+        unknown_handler = self.profiler.wrap_handler(handle_unknown_page)
+        self.over_budget_pages = []  # (主任务序号, Tab序号, 主任务名, Tab名)，留待最后重试
+        self.page_report = {}  # (主任务序号, Tab序号) -> (主任务名, Tab名, 页面类型, 处理结果)；重试时覆盖原结果
+        scheduler = None
 
         try:
             self.log("-----------------------------------------")
@@ -101,18 +126,16 @@ class AutoAnswerGUI:
             wait = WebDriverWait(self.driver, 15)
             all_main_tasks = wait.until(EC.presence_of_all_elements_located((By.CSS_SELECTOR, "div.pc-slider-menu-micro")))
             self.log(f"获取到 {len(all_main_tasks)} 个主任务。将从头开始，顺序执行。")
+            concurrent_windows = config_manager.get_concurrent_windows()
+            if concurrent_windows > 0:
+                scheduler = WindowScheduler(self.driver, concurrent_windows, self.log)
+                self.log(f"已启用并发窗口（最多 {concurrent_windows} 个），AI题将在新窗口中并行处理。")
 
             for i in range(len(all_main_tasks)):
                 if self.stop_flag.is_set(): self.log("检测到停止信号。"); break
                 
-                current_main_tasks_in_loop = self.driver.find_elements(By.CSS_SELECTOR, "div.pc-slider-menu-micro")
-                if i >= len(current_main_tasks_in_loop): self.log("主任务列表发生变化，无法继续。"); break
-                
-                main_task_to_click = current_main_tasks_in_loop[i]
-                main_task_name = main_task_to_click.text.strip()
-                self.log(f"---=> 正在进入主任务 ({i+1}/{len(all_main_tasks)}): '{main_task_name}' <=---")
-                self.driver.execute_script("arguments[0].click();", main_task_to_click)
-                time.sleep(3) 
+                main_task_name = self.enter_main_task(i, len(all_main_tasks))
+                if main_task_name is None: self.log("主任务列表发生变化，无法继续。"); break
 
                 self.log(f"开始处理 '{main_task_name}' 内部的子任务...")
                 try:
@@ -126,38 +149,131 @@ class AutoAnswerGUI:
                 for j in range(len(sub_task_tabs)):
                     if self.stop_flag.is_set(): break
                     
-                    tab_name = "Main Content"
+                    tab_index, tab_name = None, "Main Content"
                     if sub_task_tabs[0] is not None:
-                        all_current_tabs = self.driver.find_elements(By.CSS_SELECTOR, "div.ant-tabs-tab, div.pc-tab-view-container")
-                        if j >= len(all_current_tabs): continue
-                        
-                        current_tab = all_current_tabs[j]
-                        tab_name = current_tab.text.strip()
-                        if "active" not in current_tab.get_attribute('class') and "activity" not in current_tab.get_attribute('class'):
-                            self.log(f"---点击切换到Tab页: '{tab_name}'---")
-                            current_tab.click()
-                            time.sleep(2)
-                        else:
-                            self.log(f"---Tab页 '{tab_name}' 已激活，直接处理---")
-                    
-                    page_type = analyzer.get_page_type_in_tab()
-                    self.log(f"内容类型为: {page_type}")
+                        tab_index, tab_name = j, self.switch_to_tab(j)
+                        if tab_name is None: continue
                     
-                    handler_map = {
-                        "VIDEO": handle_video_page, "VOCABULARY_FLASHCARDS": handle_vocabulary_flashcards,
-                        "QUIZ_TRUE_FALSE_NG": handle_quiz_true_false, "QUIZ_FILL_IN_BLANK": handle_quiz_fill_in_blank,
-                        "QUIZ_VOCABULARY_CHOICE": handle_quiz_vocabulary_choice, "QUIZ_REWRITE_SENTENCE": handle_quiz_rewrite_sentence,
-                        "QUIZ_TRANSLATE": handle_quiz_translate,
-                        "READING": handle_skip_page, "REPEATING_AFTER_ME": handle_skip_page, "UNIT_PROJECT": handle_skip_page,
-                    }
-                    handler_map.get(page_type, handle_unknown_page)(self.driver, self)
+                    self.process_current_page(analyzer, handlers, unknown_handler, (i, tab_index, main_task_name), tab_name, scheduler)
                 
                 if self.stop_flag.is_set(): break
                 self.log(f"主任务 '{main_task_name}' 的所有子任务已处理完毕。")
 
+            if scheduler is not None:
+                self.log("等待并发窗口中的子任务完成..."); scheduler.join()
+                for line in scheduler.summary_lines(): self.log(line)
+                scheduler = None
+
+            retry_pages, self.over_budget_pages = self.over_budget_pages, []
+            if retry_pages and not self.stop_flag.is_set():
+                self.log(f"开始在主窗口重试 {len(retry_pages)} 个超时或未能在并发窗口中处理的页面...")
+                for i, tab_index, main_task_name, tab_name in retry_pages:
+                    if self.stop_flag.is_set(): break
+                    if self.enter_main_task(i, len(all_main_tasks)) is None: continue
+                    if tab_index is not None and self.switch_to_tab(tab_index) is None: continue
+                    self.process_current_page(analyzer, handlers, unknown_handler, (i, tab_index, main_task_name), tab_name)
+                for i, tab_index, main_task_name, tab_name in self.over_budget_pages:
+                    self.log(f"页面 '{main_task_name} / {tab_name}' 重试后仍超出时间预算，已放弃。")
+
             self.log("所有任务已按顺序执行完毕。")
         except WebDriverException as e: self.log(f"浏览器错误: {e}")
         except Exception as e: self.log(f"发生未知错误: {e}"); traceback.print_exc()
+        if scheduler is not None: scheduler.join()
         
+        for line in self.report_lines(): self.log(line)
+        for line in self.metrics.summary_lines(): self.log(line)
+        for line in self.profiler.finish_run(): self.log(line)
         self.root.after(0, self.stop_automation)
-        self.log("自动化任务已停止。")
\ No newline at end of file
+        self.log("自动化任务已停止。")
+
+    def enter_main_task(self, index, total=None):
+        """点击第index个主任务，返回其名称；列表发生变化时返回None。"""
+        current_main_tasks = self.driver.find_elements(By.CSS_SELECTOR, "div.pc-slider-menu-micro")
+        if index >= len(current_main_tasks): return None
+        total = total or len(current_main_tasks)
+        main_task_to_click = current_main_tasks[index]
+        main_task_name = main_task_to_click.text.strip()
+        self.log(f"---=> 正在进入主任务 ({index+1}/{total}): '{main_task_name}' <=---")
+        self.driver.execute_script("arguments[0].click();", main_task_to_click)
+        time.sleep(3)
+        return main_task_name
+
+    def switch_to_tab(self, index):
+        """切换到第index个子任务Tab，返回Tab名称；Tab不存在时返回None。"""
+        all_current_tabs = self.driver.find_elements(By.CSS_SELECTOR, "div.ant-tabs-tab, div.pc-tab-view-container")
+        if index >= len(all_current_tabs): return None
+        current_tab = all_current_tabs[index]
+        tab_name = current_tab.text.strip()
+        if "active" not in current_tab.get_attribute('class') and "activity" not in current_tab.get_attribute('class'):
+            self.log(f"---点击切换到Tab页: '{tab_name}'---")
+            current_tab.click()
+            time.sleep(2)
+        else:
+            self.log(f"---Tab页 '{tab_name}' 已激活，直接处理---")
+        return tab_name
+
+    def process_current_page(self, analyzer, handlers, unknown_handler, location, tab_name, scheduler=None):
+        """
+        在页面时间预算内识别并处理当前页面；location 为 (主任务序号, Tab序号, 主任务名)。
+        提供 scheduler 且页面类型允许并发时，交给新窗口处理，主窗口立即返回继续导航。
+        """
+        main_task_name = location[2]
+        with deadline.page_budget(config_manager.get_page_time_budget()) as page_deadline:
+            page_type, fingerprint, from_cache = analyzer.classify(tab_name)
+            self.log(f"内容类型为: {page_type}" + (" (缓存)" if from_cache else ""))
+            if scheduler is not None and scheduler.accepts(page_type):
+                scheduler.submit(f"{main_task_name} / {tab_name}", self.process_page_in_window, analyzer, handlers.get(page_type, unknown_handler),
+                                 location, tab_name, page_type, fingerprint, self.driver.current_url)
+                self.log(f"页面 '{tab_name}' 已交给并发窗口处理。"); return
+            self.run_handler(analyzer, handlers.get(page_type, unknown_handler), location, tab_name, page_type, fingerprint, page_deadline)
+
+    def run_handler(self, analyzer, handler, location, tab_name, page_type, fingerprint, page_deadline):
+        """在当前窗口运行已识别类型的处理器，并记录结果、作废缓存或安排重试。"""
+        main_task_name = location[2]
+        timed_out, result = False, None
+        try:
+            with self.metrics.track(handler.__name__, page_type): result = handler(self.driver, self)
+        except deadline.DeadlineExceeded: timed_out = True
+        # 只有处理器在预算内判定"类型不符"才作废缓存；被预算截断的等待不能说明页面类型识别有误
+        if result is False and not page_deadline.expired():
+            self.log("处理器报告页面与识别类型不符，已作废该页面的类型缓存。"); analyzer.invalidate(fingerprint)
+        # 只重试确实被预算中断的页面：处理器正常返回时可能已经点过提交，重试会重复提交
+        if timed_out:
+            self.log(f"页面 '{tab_name}' 超出时间预算，已跳过，稍后重试。")
+            self.over_budget_pages.append((location[0], location[1], main_task_name, tab_name))
+        status = "超时" if timed_out else "类型不符" if result is False else "完成"
+        self.page_report[location[:2]] = (main_task_name, tab_name, page_type, status)
+
+    def process_page_in_window(self, analyzer, handler, location, tab_name, page_type, fingerprint, url):
+        """
+        在调度器分配的新窗口中重走 主任务 -> Tab 的导航，确认到达的正是主窗口识别过的页面后直接运行其处理器
+        （运行在调度器的工作线程里）。不重新识别页面类型；主任务名、Tab名或页面指纹对不上时，留待最后在主窗口重试。
+        """
+        if self.stop_flag.is_set(): return
+        main_task_name = location[2]
+        with deadline.page_budget(config_manager.get_page_time_budget()) as page_deadline:
+            # 用脚本触发跳转：这条命令立即返回，不像driver.get那样在一条命令内占着会话等整个页面加载完
+            try:
+                self.driver.execute_script("window.location.href = arguments[0];", url)
+                WebDriverWait(self.driver, deadline.timeout(20)).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.pc-slider-menu-micro")))
+                reached = self.enter_main_task(location[0]) == main_task_name
+                if reached and location[1] is not None:
+                    WebDriverWait(self.driver, deadline.timeout(10)).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.ant-tabs-nav, div.pc-header-tabs-container")))
+                    reached = self.switch_to_tab(location[1]) == tab_name
+                if reached and fingerprint: time.sleep(1); reached = analyzer.get_fingerprint(tab_name) == fingerprint
+            except (WebDriverException, deadline.DeadlineExceeded) as e:  # 超时、元素失效、窗口被关闭等都交回主窗口重试
+                self.log(f"并发窗口导航出错: {type(e).__name__}"); reached = False
+            if not reached:
+                self.log(f"并发窗口未能打开与主窗口一致的页面 '{main_task_name} / {tab_name}'，留待最后在主窗口重试。")
+                self.over_budget_pages.append((location[0], location[1], main_task_name, tab_name)); return
+            self.run_handler(analyzer, handler, location, tab_name, page_type, fingerprint, page_deadline)
+
+    def report_lines(self):
+        """把主窗口和并发窗口的处理结果汇总为一份运行报告。"""
+        if not self.page_report: return []
+        counts = {}
+        for _, _, _, status in self.page_report.values(): counts[status] = counts.get(status, 0) + 1
+        lines = ["运行报告: " + ", ".join(f"{status} {n} 个页面" for status, n in counts.items())]
+        lines += [f"  {status}: {main_task_name} / {tab_name} [{page_type}]"
+                  for main_task_name, tab_name, page_type, status in self.page_report.values() if status != "完成"]
+        return lines
\ No newline at end of file
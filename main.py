@@ -1,7 +1,7 @@
 # File: main.py
 import tkinter as tk
 from gui import AutoAnswerGUI
-import os
+import os, sys
 
 if __name__ == "__main__":
     if os.name == 'nt':
@@ -12,5 +12,5 @@ if __name__ == "__main__":
             pass
             
     root = tk.Tk()
-    app = AutoAnswerGUI(root)
+    app = AutoAnswerGUI(root, profile='--profile' in sys.argv[1:])
     root.mainloop()
\ No newline at end of file
@@ -1,17 +1,74 @@
 # File: page_analyzer.py
-import time
+import time, os, json, hashlib, threading
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
+import config_manager
+
+CACHE_PATH = os.path.join(config_manager.CURRENT_DIR, 'page_type_cache.json')
+# 跳过类页面的处理器什么也不做，无法发现识别错误并作废缓存；这些类型每次都重新识别，不写入缓存
+UNCACHED_PAGE_TYPES = {"UNKNOWN", "READING", "REPEATING_AFTER_ME", "UNIT_PROJECT"}
+
+# 一次往返取回页面指纹所需的信息：地址 + 若干结构性选择器的命中数量
+FINGERPRINT_SCRIPT = """
+var selectors = ['video', 'iframe', 'div.word-card, div.word-detail-container', 'div.word-bank, div.word-bank-item',
+                 'div.question-item, div.ques-item', 'input', 'textarea', 'div.ql-editor'];
+return [location.origin + location.pathname + location.hash,
+        selectors.map(function (s) { return document.querySelectorAll(s).length; }).join(',')];
+"""
+
+class PageTypeCache:
+    """页面类型缓存：页面指纹 -> 页面类型，持久化到 page_type_cache.json，跨运行复用。"""
+    def __init__(self, path=CACHE_PATH):
+        self.path = path; self._lock = threading.Lock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f: self._entries = json.load(f)
+        except (OSError, ValueError): self._entries = {}
+
+    def get(self, fingerprint): return self._entries.get(fingerprint)
+
+    def put(self, fingerprint, page_type):
+        with self._lock:
+            if self._entries.get(fingerprint) == page_type: return
+            self._entries[fingerprint] = page_type; self._save()
+
+    def invalidate(self, fingerprint):
+        with self._lock:
+            if self._entries.pop(fingerprint, None) is not None: self._save()
+
+    def _save(self):
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f: json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        except OSError as e: print(f"保存页面类型缓存失败: {e}")
 
 class PageAnalyzer:
-    def __init__(self, driver: WebDriver): self.driver = driver
+    def __init__(self, driver: WebDriver, cache: PageTypeCache = None): self.driver = driver; self.cache = cache
     def _element_exists(self, by, value):
         try: self.driver.find_element(by, value); return True
         except NoSuchElementException: return False
 
-    def get_page_type_in_tab(self) -> str:
+    def get_fingerprint(self, tab_name: str = "") -> str:
+        """用地址、Tab标题和结构签名计算页面指纹（只需一次WebDriver往返）。"""
+        url, structure = self.driver.execute_script(FINGERPRINT_SCRIPT)
+        return hashlib.sha1(f"{url}|{tab_name}|{structure}".encode('utf-8')).hexdigest()
+
+    def classify(self, tab_name: str = ""):
+        """先查缓存，未命中时再运行完整识别。返回 (页面类型, 指纹, 是否命中缓存)。"""
         time.sleep(1)
+        if self.cache is None: return self.detect_page_type(), None, False
+        fingerprint = self.get_fingerprint(tab_name)
+        cached = self.cache.get(fingerprint)
+        if cached in UNCACHED_PAGE_TYPES: self.cache.invalidate(fingerprint)  # 旧版本写入的条目
+        elif cached: return cached, fingerprint, True
+        page_type = self.detect_page_type()
+        if page_type not in UNCACHED_PAGE_TYPES: self.cache.put(fingerprint, page_type)
+        return page_type, fingerprint, False
+
+    def invalidate(self, fingerprint):
+        """处理器报告页面与类型不符时调用，删除对应的缓存条目。"""
+        if self.cache is not None and fingerprint: self.cache.invalidate(fingerprint)
+
+    def detect_page_type(self) -> str:
         if self._element_exists(By.TAG_NAME, "video"): return "VIDEO"
         if self._element_exists(By.CSS_SELECTOR, "div.word-card, div.word-detail-container"): return "VOCABULARY_FLASHCARDS"
         if self._element_exists(By.XPATH, "//*[contains(text(), 'True') and contains(text(), 'False')]"): return "QUIZ_TRUE_FALSE_NG"
@@ -22,4 +79,4 @@ class PageAnalyzer:
         if self._element_exists(By.XPATH, "//*[contains(text(), 'Read aloud')]"): return "REPEATING_AFTER_ME"
         if self._element_exists(By.XPATH, "//*[contains(text(), 'Reading in detail')]"): return "READING"
         if self._element_exists(By.XPATH, "//*[contains(text(), 'Unit project')]"): return "UNIT_PROJECT"
-        return "UNKNOWN"
\ No newline at end of file
+        return "UNKNOWN"
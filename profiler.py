@@ -0,0 +1,148 @@
+# File: profiler.py
+import cProfile, pstats, os, sys, time, threading, functools, collections
+from contextlib import contextmanager
+import config_manager
+
+PROFILE_DIR = os.path.join(config_manager.CURRENT_DIR, 'profiles')
+
+class RunProfiler:
+    """
+    运行期性能分析器（--profile 模式或界面勾选开启，可在运行中随时切换）。
+    - 每个处理器用 cProfile 做确定性分析，结束时按处理器写出 .prof 文件；
+    - 后台线程对处理器所在线程做栈采样，汇总成 flamegraph.pl / speedscope 可直接读取的折叠栈文件；
+    - 将每次处理器调用的墙钟时间拆分为 Python CPU、WebDriver 通信、HTTP(AI) 等待三部分。
+    """
+    def __init__(self, enabled=False, sample_interval=0.005):
+        self.enabled = enabled
+        self.sample_interval = sample_interval
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = {}  # 线程ID -> 正在执行的处理器名
+        self._sampler = None
+        self._reset()
+
+    def _reset(self):
+        self._timings = collections.OrderedDict()  # 处理器名 -> 累计耗时
+        self._profiles = {}  # 处理器名 -> pstats.Stats
+        self._folded = collections.Counter()
+
+    # --- 计时挂钩 ---
+    def _add(self, key, wall_start, cpu_start):
+        # 通信过程中本线程自身的CPU消耗（序列化等）也记入通信耗时，避免与Python CPU重复计算
+        record = getattr(self._local, 'record', None)
+        if record is None: return
+        record[key] += time.perf_counter() - wall_start
+        record['io_cpu'] += time.thread_time() - cpu_start
+
+    def attach_driver(self, driver):
+        """在driver实例上挂钩execute，统计WebDriver命令往返耗时（元素上的命令同样经过此处）。"""
+        if getattr(driver, '_profiler_attached', False): return driver
+        original_execute = driver.execute
+        def execute(driver_command, params=None):
+            wall_start, cpu_start = time.perf_counter(), time.thread_time()
+            try: return original_execute(driver_command, params)
+            finally: self._add('webdriver', wall_start, cpu_start)
+        driver.execute = execute; driver._profiler_attached = True
+        return driver
+
+    @contextmanager
+    def measure(self, key):
+        """把一段代码的耗时记入当前处理器的某一项（'webdriver' 或 'http'），如并发AI请求的整体等待时间。"""
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try: yield
+        finally: self._add(key, wall_start, cpu_start)
+
+    def wrap_provider(self, provider):
+        """包装AI提供者的call_ai，统计HTTP等待耗时。"""
+        original_call_ai = provider.call_ai
+        def call_ai(prompt):
+            with self.measure('http'): return original_call_ai(prompt)
+        provider.call_ai = call_ai
+        return provider
+
+    def wrap_handler(self, handler):
+        """包装任务处理器；未开启分析时直接透传，不产生额外开销。"""
+        name = handler.__name__
+        @functools.wraps(handler)
+        def wrapper(driver, gui):
+            if not self.enabled: return handler(driver, gui)
+            return self._run_profiled(name, handler, driver, gui)
+        return wrapper
+
+    def _run_profiled(self, name, handler, driver, gui):
+        record = {'webdriver': 0.0, 'http': 0.0, 'io_cpu': 0.0}
+        self._local.record = record
+        profile = cProfile.Profile()
+        try: profile.enable()
+        except ValueError: profile = None  # 同一时刻只允许一个分析器时（Python 3.12+ 并发处理器），退化为只计时
+        self._start_sampling(name)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            return handler(driver, gui)
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            if profile is not None: profile.disable()
+            self._stop_sampling()
+            self._local.record = None
+            self._merge(name, profile, wall, cpu, record)
+
+    def _merge(self, name, profile, wall, cpu, record):
+        with self._lock:
+            timing = self._timings.setdefault(name, {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'webdriver': 0.0, 'http': 0.0})
+            timing['calls'] += 1; timing['wall'] += wall; timing['cpu'] += max(cpu - record['io_cpu'], 0.0)
+            timing['webdriver'] += record['webdriver']; timing['http'] += record['http']
+            if profile is None: return
+            if name in self._profiles: self._profiles[name].add(profile)
+            else: self._profiles[name] = pstats.Stats(profile)
+
+    # --- 栈采样（火焰图） ---
+    def _start_sampling(self, name):
+        with self._lock:
+            self._active[threading.get_ident()] = name
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+                self._sampler.start()
+
+    def _stop_sampling(self):
+        with self._lock: self._active.pop(threading.get_ident(), None)
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                if not self._active: self._sampler = None; return
+                active = dict(self._active)
+            frames = sys._current_frames()
+            for thread_id, name in active.items():
+                frame = frames.get(thread_id); stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                    frame = frame.f_back
+                stack.append(name); stack.reverse()
+                with self._lock: self._folded[";".join(stack)] += 1
+            time.sleep(self.sample_interval)
+
+    # --- 输出 ---
+    def finish_run(self) -> list:
+        """写出本次运行的分析文件，返回用于日志的摘要行；没有数据时返回空列表。"""
+        with self._lock:
+            timings, profiles, folded = self._timings, self._profiles, self._folded
+            self._reset()
+        if not timings: return []
+        run_dir = os.path.join(PROFILE_DIR, time.strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(run_dir, exist_ok=True)
+        aggregated = None
+        for name, stats in profiles.items():
+            stats.dump_stats(os.path.join(run_dir, f"{name}.prof"))
+            if aggregated is None: aggregated = stats
+            else: aggregated.add(stats)
+        if aggregated is not None: aggregated.dump_stats(os.path.join(run_dir, "all_handlers.prof"))
+        with open(os.path.join(run_dir, "flamegraph.folded"), 'w', encoding='utf-8') as f:
+            for stack, count in folded.most_common(): f.write(f"{stack} {count}\n")
+
+        lines = [f"性能分析结果已写入: {run_dir}"]
+        for name, t in timings.items():
+            other = max(t['wall'] - t['cpu'] - t['webdriver'] - t['http'], 0.0)
+            lines.append(f"  {name} x{t['calls']}: 总计 {t['wall']:.2f}s = Python CPU {t['cpu']:.2f}s"
+                         f" + WebDriver {t['webdriver']:.2f}s + HTTP {t['http']:.2f}s + 其他等待 {other:.2f}s")
+        return lines
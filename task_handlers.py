@@ -1,33 +1,66 @@
 # File: task_handlers.py (The Final Corrected Version)
 import time
+from concurrent.futures import ThreadPoolExecutor
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import tkinter as tk
 from tkinter import messagebox
-import ai_handler, browser_handler, config_manager
+import ai_handler, answer_index, answer_parser, browser_handler, config_manager, deadline
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from gui import AutoAnswerGUI
 
-def call_ai(gui: 'AutoAnswerGUI', prompt: str):
-    """一个统一的AI调用辅助函数。"""
+def get_provider(gui: 'AutoAnswerGUI'):
+    """检查当前所选模型的API Key并创建AI提供者；Key未设置时弹窗提示并返回None。"""
     model_name = gui.selected_model.get()
     api_key = config_manager.get_api_key(model_name.split(" ")[0].lower())
     if not api_key or "YOUR_" in api_key:
-        messagebox.showerror("API Key Error", f"错误：{model_name}的API Key未设置。"); return None
-    gui.ai_debug_text.delete(1.0, tk.END)
-    gui.ai_debug_text.insert(tk.END, f"--- 发送给AI的Prompt ---\n{prompt}")
-    provider = ai_handler.get_ai_provider(model_name, api_key)
-    response = provider.call_ai(prompt).strip()
-    gui.ai_debug_text.insert(tk.END, f"\n\n--- AI返回的原始回答 ---\n{response}")
+        gui.root.after(0, messagebox.showerror, "API Key Error", f"错误：{model_name}的API Key未设置。"); return None
+    return ai_handler.get_ai_provider(model_name, api_key)
+
+def call_ai(gui: 'AutoAnswerGUI', prompt: str):
+    """一个统一的AI调用辅助函数。"""
+    provider = get_provider(gui)
+    if provider is None: return None
+    gui.show_ai_debug(prompt)
+    response = gui.profiler.wrap_provider(provider).call_ai(prompt).strip()
+    gui.show_ai_debug(prompt, response)
+    if response.startswith("Error calling"): deadline.check(); gui.log(f"AI请求失败: {response}"); return None  # 请求因预算截断而超时时按超时处理
     return response
 
+def call_ai_batch(gui: 'AutoAnswerGUI', prompts: list):
+    """并发发送多个Prompt，按原顺序返回回答；任一请求失败时返回None。"""
+    provider = get_provider(gui)
+    if provider is None: return None
+    prompt_text = "\n-----\n".join(prompts)
+    gui.show_ai_debug(prompt_text)
+    page_deadline = deadline.current()
+    def call_with_page_deadline(prompt):
+        with deadline.use(page_deadline): return provider.call_ai(prompt)
+    with gui.profiler.measure('http'), ThreadPoolExecutor(max_workers=min(len(prompts), config_manager.get_ai_max_workers())) as pool:
+        responses = [r.strip() for r in pool.map(call_with_page_deadline, prompts)]
+    gui.show_ai_debug(prompt_text, "\n-----\n".join(responses))
+    failed = [r for r in responses if not r or r.startswith("Error calling")]
+    if failed: deadline.check(); gui.log(f"AI请求失败: {failed[0]}"); return None
+    return responses
+
+def click_choice_answers(gui: 'AutoAnswerGUI', questions: list, choice_index: 'answer_index.ChoiceIndex', ai_response: str):
+    """先用选项索引在本地校验/纠正全部答案，再依次点击；无法确定的题目只记录警告，不去点击。"""
+    targets = []
+    for i, raw_answer in enumerate(answer_parser.tokenize(ai_response, bare_fallback=True)[:len(questions)]):
+        letter, element = choice_index.resolve(i, raw_answer)
+        if element is not None: targets.append(element)
+        elif letter and not choice_index.has_options(i):  # 未能建立该题的选项索引，退回按文本查找
+            targets.append(questions[i].find_element(By.XPATH, f".//span[contains(text(), '{letter}')]"))
+        else: gui.log(f"警告：第 {i+1} 题的回答 '{raw_answer}' 不对应任何选项，已跳过。")
+    for element in targets:
+        element.click(); deadline.sleep(0.5)
+
 def handle_skip_page(driver: WebDriver, gui: 'AutoAnswerGUI'):
-    """通用跳过处理器。"""
-    gui.log("任务：此页面类型被设定为自动跳过。"); time.sleep(2)
+    """通用跳过处理器：页面已经打开，无需再做任何操作。"""
+    gui.log("任务：此页面类型被设定为自动跳过。")
 
 def handle_video_page(driver: WebDriver, gui: 'AutoAnswerGUI'):
     """处理视频播放页面：有足够的耐心等待iframe内部元素。"""
@@ -35,24 +68,24 @@ def handle_video_page(driver: WebDriver, gui: 'AutoAnswerGUI'):
     iframe_found = False
     try:
         # 等待iframe出现，然后切换
-        wait = WebDriverWait(driver, 10) # 等待10秒
+        wait = WebDriverWait(driver, deadline.timeout(10)) # 等待10秒
         iframe_element = wait.until(EC.presence_of_element_located((By.TAG_NAME, "iframe")))
         driver.switch_to.frame(iframe_element)
         iframe_found = True
         gui.log("成功切换到iframe中。")
         
         # --- 关键修正：进入iframe后，必须再次等待其内部的video标签加载 ---
-        wait_inside_iframe = WebDriverWait(driver, 20) # 给予充足的20秒等待时间
+        wait_inside_iframe = WebDriverWait(driver, deadline.timeout(20)) # 给予充足的20秒等待时间
         video_element = wait_inside_iframe.until(EC.presence_of_element_located((By.TAG_NAME, "video")))
         gui.log("在iframe内成功定位到视频元素。")
         
         driver.execute_script("arguments[0].playbackRate = 16; arguments[0].muted = true; arguments[0].play();", video_element)
         gui.log("已发送播放指令。")
         
-        start_time = time.time()
-        while time.time() - start_time < 300: # 最多等待5分钟，以应对长视频
+        start_time, max_wait = time.time(), deadline.timeout(300)
+        while time.time() - start_time < max_wait: # 最多等待5分钟（且不超过页面剩余预算），以应对长视频
             if gui.stop_flag.is_set(): break
-            time.sleep(2)
+            deadline.sleep(2)
             try:
                 progress = driver.execute_script("return {currentTime: arguments[0].currentTime, duration: arguments[0].duration, ended: arguments[0].ended};", video_element)
                 if progress and progress.get('duration') and progress['duration'] > 0:
@@ -60,8 +93,11 @@ def handle_video_page(driver: WebDriver, gui: 'AutoAnswerGUI'):
                         gui.log("视频播放完毕。"); break
             except Exception:
                 gui.log("视频元素状态已更新或丢失，判定为播放结束。"); break
+            deadline.check()  # 预算耗尽时视频仍未播完：按超时处理，留待重试，而不是当作完成
     except TimeoutException:
-        gui.log("警告：在指定时间内未找到视频iframe或video元素，将跳过。")
+        deadline.check()
+        gui.log("警告：在指定时间内未找到视频iframe或video元素，将跳过。"); return False
+    except deadline.DeadlineExceeded: raise
     except Exception as e:
         gui.log(f"处理视频时发生未知错误: {e}")
     finally:
@@ -70,22 +106,66 @@ def handle_video_page(driver: WebDriver, gui: 'AutoAnswerGUI'):
             gui.log("已从iframe切回主页面。")
 
 
+# 在页面内连续翻卡：点击“下一条”后等待页码真正变化再翻下一张，翻满 maxSteps 张或到达本批时限即返回位置；
+# error 为 null 表示本批正常结束（可能尚未翻完），否则为中断原因
+FLASHCARD_ADVANCE_SCRIPT = r"""
+var done = arguments[arguments.length - 1], deadlineAt = Date.now() + arguments[0], stepTimeout = arguments[1], maxSteps = arguments[2], steps = 0;
+function readPager() {
+    var el = document.querySelector('div.page-number, span.pager-num');
+    var m = el && el.textContent.match(/(\d+)\s*\/\s*(\d+)/);
+    return m ? {current: parseInt(m[1], 10), total: parseInt(m[2], 10)} : null;
+}
+function nextButton() {
+    var spans = document.querySelectorAll('button span');
+    for (var i = 0; i < spans.length; i++) if (spans[i].textContent.trim() === '下一条') return spans[i].parentElement;
+    return null;
+}
+var pos = readPager();
+if (!pos) { done({current: 0, total: 0, error: '未找到卡片页码'}); return; }
+function finish(error) { done({current: pos.current, total: pos.total, error: error}); }
+function step() {
+    if (pos.current >= pos.total || steps >= maxSteps || Date.now() >= deadlineAt) { finish(null); return; }
+    var button = nextButton();
+    if (!button || button.disabled) { finish('“下一条”按钮不可用'); return; }
+    var observer, timer;
+    function check() {
+        var now = readPager();
+        if (now && now.current !== pos.current) { observer.disconnect(); clearTimeout(timer); pos = now; steps++; step(); }
+    }
+    observer = new MutationObserver(check);
+    observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+    timer = setTimeout(function () { observer.disconnect(); finish(Date.now() >= deadlineAt ? null : '翻页后页码未更新'); }, Math.min(stepTimeout, deadlineAt - Date.now()));
+    button.click();
+}
+step();
+"""
+
+FLASHCARD_BATCH_STEPS, FLASHCARD_BATCH_SECONDS = 20, 10  # 每个异步脚本最多翻的卡片数和时长，批与批之间检查停止信号
+
 def handle_vocabulary_flashcards(driver: WebDriver, gui: 'AutoAnswerGUI'):
-    """处理单词卡片学习页面：快速翻完所有卡片。"""
+    """处理单词卡片学习页面：在页面内分批翻完所有卡片，每批一个异步脚本。"""
     gui.log("任务：单词卡片处理器已启动。")
     try:
-        wait = WebDriverWait(driver, 10)
-        next_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//span[text()='下一条']/parent::button")))
-        progress_text = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.page-number, span.pager-num"))).text
-        current, total = [int(x.strip()) for x in progress_text.split('/')]
-        gui.log(f"检测到总共有 {total} 个单词卡片。")
-
-        for i in range(current, total):
-            if gui.stop_flag.is_set(): gui.log("操作被用户停止。"); return
-            next_button.click()
-            gui.log(f"正在翻动卡片: {i + 1} / {total}")
-            time.sleep(0.5)
-        gui.log("所有单词卡片已学习完毕。")
+        WebDriverWait(driver, deadline.timeout(10)).until(EC.element_to_be_clickable((By.XPATH, "//span[text()='下一条']/parent::button")))
+        previous_timeout = driver.timeouts.script
+        driver.set_script_timeout(FLASHCARD_BATCH_SECONDS + 5)
+        try:
+            while True:
+                if gui.stop_flag.is_set(): gui.log("检测到停止信号，单词卡片未翻完。"); return
+                batch_seconds = deadline.timeout(FLASHCARD_BATCH_SECONDS)
+                result = driver.execute_async_script(FLASHCARD_ADVANCE_SCRIPT, int(batch_seconds * 1000), 5000, FLASHCARD_BATCH_STEPS)
+                if not result.get('total'): gui.log(f"警告：{result.get('error')}，页面类型可能识别有误。"); return False
+                if result.get('error'):
+                    deadline.check()
+                    gui.log(f"翻卡中断于 {result['current']} / {result['total']}: {result['error']}"); return
+                if result['current'] >= result['total']: break
+                gui.log(f"单词卡片进度: {result['current']} / {result['total']}")
+        finally: driver.set_script_timeout(previous_timeout)
+        gui.log(f"所有单词卡片已学习完毕（共 {result['total']} 个）。")
+    except TimeoutException:
+        deadline.check()
+        gui.log("警告：未找到单词卡片的翻页按钮，页面类型可能识别有误。"); return False
+    except deadline.DeadlineExceeded: raise
     except Exception as e:
         gui.log(f"处理单词卡片时出错: {e}")
 
@@ -93,20 +173,19 @@ def handle_quiz_true_false(driver: WebDriver, gui: 'AutoAnswerGUI'):
     """使用AI处理判断题（True/False/Not Given）。"""
     gui.log("任务：AI判断题处理器已启动。")
     try:
-        questions_container = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.question-list, div.ques-list")))
+        questions_container = WebDriverWait(driver, deadline.timeout(10)).until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.question-list, div.ques-list")))
         questions = questions_container.find_elements(By.CSS_SELECTOR, "div.question-item, div.ques-item")
+        gui.metrics.count_items(len(questions))
         text_for_ai = "".join([f"Question {i+1}: {q.text.splitlines()[0]}\n" for i, q in enumerate(questions)])
         prompt = f"You are an English reading comprehension expert. For the following statements, decide if they are True, False, or Not Given based on the article. Respond ONLY with the letter (A for True, B for False, C for Not Given) for each question, each on a new line.\n\n{text_for_ai}"
+        choice_index = answer_index.ChoiceIndex.build(driver, questions)
         ai_response = call_ai(gui, prompt)
         if not ai_response: return
-        answers = ai_response.split('\n')
-        for i, ans in enumerate(answers):
-            if i < len(questions):
-                option_letter = ans.strip().upper()
-                questions[i].find_element(By.XPATH, f".//span[contains(text(), '{option_letter}')]").click()
-                time.sleep(0.5)
+        click_choice_answers(gui, questions, choice_index, ai_response)
         driver.find_element(By.XPATH, "//button[contains(span, '提交')]").click()
         gui.log("判断题已提交。")
+    except TimeoutException: deadline.check(); gui.log("警告：未找到判断题题目列表，页面类型可能识别有误。"); return False
+    except deadline.DeadlineExceeded: raise
     except Exception as e: gui.log(f"处理判断题时出错: {e}")
 
 def handle_quiz_fill_in_blank(driver: WebDriver, gui: 'AutoAnswerGUI'):
@@ -114,17 +193,21 @@ def handle_quiz_fill_in_blank(driver: WebDriver, gui: 'AutoAnswerGUI'):
     gui.log("任务：AI选词填空处理器已启动。")
     try:
         page_data = browser_handler.extract_questions_from_page(driver)
-        if not page_data.get("questions"): gui.log("警告：未能提取到题目。"); return
+        if not page_data.get("questions"): deadline.check(); gui.log("警告：未能提取到题目。"); return False
+        gui.metrics.count_items(len(page_data['questions']))
         blank_counts = browser_handler.get_blank_counts(driver, len(page_data['questions']))
         prompt = ai_handler.build_prompt(**page_data, blank_counts=blank_counts)
         ai_response = call_ai(gui, prompt)
         if not ai_response: return
-        answers = ai_handler.parse_ai_response(ai_response)
+        answers = answer_parser.parse_ai_response(ai_response)
         if not answers: gui.log("警告：未能解析出有效答案。"); return
+        answers, problems = answer_index.WordBankIndex(page_data['options']).validate(answers, blank_counts)
+        for problem in problems: gui.log(f"答案校验：{problem}")
         gui.log(f"成功解析出答案，准备填写: {answers}")
         browser_handler.fill_answers_to_webpage(driver, answers)
         gui.log("答案已成功填写到网页！")
         # 选词填空通常没有提交按钮，是即时判断的
+    except deadline.DeadlineExceeded: raise
     except Exception as e: gui.log(f"处理选词填空时出错: {e}")
 
 def handle_quiz_vocabulary_choice(driver: WebDriver, gui: 'AutoAnswerGUI'):
@@ -132,18 +215,17 @@ def handle_quiz_vocabulary_choice(driver: WebDriver, gui: 'AutoAnswerGUI'):
     gui.log("任务：AI词义辨析处理器已启动。")
     try:
         questions = driver.find_elements(By.CSS_SELECTOR, "div.question-item, div.ques-item")
+        if not questions: gui.log("警告：未找到词义辨析题目。"); return False
+        gui.metrics.count_items(len(questions))
         text_for_ai = "".join([f"Question {i+1}: {q.text}\n" for i, q in enumerate(questions)])
         prompt = f"You are an English vocabulary expert. For the following questions, choose the correct option (A or B) that best explains the italicized word. Respond ONLY with the letter (A or B) for each question, each on a new line.\n\n{text_for_ai}"
+        choice_index = answer_index.ChoiceIndex.build(driver, questions)
         ai_response = call_ai(gui, prompt)
         if not ai_response: return
-        answers = ai_response.split('\n')
-        for i, ans in enumerate(answers):
-            if i < len(questions):
-                option_letter = ans.strip().upper()
-                questions[i].find_element(By.XPATH, f".//span[contains(text(), '{option_letter}')]").click()
-                time.sleep(0.5)
+        click_choice_answers(gui, questions, choice_index, ai_response)
         driver.find_element(By.XPATH, "//button[contains(span, '提交')]").click()
         gui.log("词义辨析题已提交。")
+    except deadline.DeadlineExceeded: raise
     except Exception as e: gui.log(f"处理词义辨析时出错: {e}")
 
 def handle_quiz_rewrite_sentence(driver: WebDriver, gui: 'AutoAnswerGUI'):
@@ -151,34 +233,48 @@ def handle_quiz_rewrite_sentence(driver: WebDriver, gui: 'AutoAnswerGUI'):
     gui.log("任务：AI句子改写处理器已启动。")
     try:
         questions = driver.find_elements(By.CSS_SELECTOR, "div.question-item, div.ques-item")
+        if not questions: gui.log("警告：未找到句子改写题目。"); return False
+        gui.metrics.count_items(len(questions))
         text_for_ai = "".join([f"Original: {q.find_element(By.CSS_SELECTOR, 'div.stem').text}\n" for q in questions])
         prompt = f"You are an expert in English grammar. Rewrite the following sentences to correct the errors, focusing on parallel structure. Provide ONLY the corrected sentence for each item, each on a new line.\n\n{text_for_ai}"
         ai_response = call_ai(gui, prompt)
         if not ai_response: return
-        answers = ai_response.split('\n')
-        for i, ans in enumerate(answers):
-            if i < len(questions):
-                textarea = questions[i].find_element(By.TAG_NAME, "textarea")
-                textarea.send_keys(ans.strip())
+        for i, ans in enumerate(answer_parser.tokenize(ai_response, bare_fallback=True)[:len(questions)]):
+            questions[i].find_element(By.TAG_NAME, "textarea").send_keys(ans)
         driver.find_element(By.XPATH, "//button[contains(span, '提交')]").click()
         gui.log("句子改写题已提交。")
+    except deadline.DeadlineExceeded: raise
     except Exception as e: gui.log(f"处理句子改写时出错: {e}")
 
 def handle_quiz_translate(driver: WebDriver, gui: 'AutoAnswerGUI'):
-    """处理英译汉。"""
+    """处理英译汉：长段落按句子切分成块，并发翻译后按原顺序一次性写入编辑器。"""
     gui.log("任务：AI翻译处理器已启动。")
     try:
         original_text = driver.find_element(By.CSS_SELECTOR, "div.ql-editor, div.translate-area").text
-        prompt = f"Please translate the following English paragraph into Chinese. Provide ONLY the Chinese translation.\n\n{original_text}"
-        ai_response = call_ai(gui, prompt)
-        if not ai_response: return
+        chunks = ai_handler.split_into_chunks(original_text, config_manager.get_translate_chunk_tokens())
+        if not chunks: gui.log("警告：未能读取到待翻译的原文。"); return False
         editor = driver.find_element(By.CSS_SELECTOR, "div.ql-editor")
-        driver.execute_script("arguments[0].innerHTML = arguments[1];", editor, ai_response.replace('\n', '<br>'))
+        gui.log(f"原文已切分为 {len(chunks)} 块，正在并发翻译...")
+        translations = call_ai_batch(gui, [ai_handler.build_translation_prompt(chunks, i) for i in range(len(chunks))])
+        if not translations: return
+        translated = ai_handler.join_translations(chunks, translations)
+        driver.execute_script("arguments[0].innerHTML = arguments[1];", editor, translated.replace('\n', '<br>'))
         driver.find_element(By.XPATH, "//button[contains(span, '提交')]").click()
         gui.log("翻译题已提交。")
+    except NoSuchElementException: gui.log("警告：未找到翻译原文或编辑器，页面类型可能识别有误。"); return False
+    except deadline.DeadlineExceeded: raise
     except Exception as e: gui.log(f"处理翻译题时出错: {e}")
 
 def handle_unknown_page(driver: WebDriver, gui: 'AutoAnswerGUI'):
     """处理未知类型的页面。"""
     gui.log("警告：当前页面类型无法自动识别，将等待5秒后尝试进入下一个主任务。")
-    time.sleep(5)
\ No newline at end of file
+    deadline.sleep(5)
+
+# 页面类型 -> 处理器。处理器返回 False 表示页面内容与该类型不符（用于作废页面类型缓存）。
+HANDLER_REGISTRY = {
+    "VIDEO": handle_video_page, "VOCABULARY_FLASHCARDS": handle_vocabulary_flashcards,
+    "QUIZ_TRUE_FALSE_NG": handle_quiz_true_false, "QUIZ_FILL_IN_BLANK": handle_quiz_fill_in_blank,
+    "QUIZ_VOCABULARY_CHOICE": handle_quiz_vocabulary_choice, "QUIZ_REWRITE_SENTENCE": handle_quiz_rewrite_sentence,
+    "QUIZ_TRANSLATE": handle_quiz_translate,
+    "READING": handle_skip_page, "REPEATING_AFTER_ME": handle_skip_page, "UNIT_PROJECT": handle_skip_page,
+}
@@ -0,0 +1,125 @@
+# File: window_scheduler.py
+import threading, time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from selenium.webdriver.remote.command import Command
+
+# 可以放到其他窗口并发处理的页面类型：AI题等待模型期间，主窗口可以继续导航。
+# 视频和单词卡片需要长时间独占页面（iframe/异步脚本），仍在主窗口中顺序处理；
+# 跳过类页面在主窗口中已经打开并识别完毕，直接处理比在新窗口中重新导航便宜得多，也不交给并发窗口。
+CONCURRENT_PAGE_TYPES = {
+    "QUIZ_TRUE_FALSE_NG", "QUIZ_FILL_IN_BLANK", "QUIZ_VOCABULARY_CHOICE", "QUIZ_REWRITE_SENTENCE", "QUIZ_TRANSLATE",
+}
+OWNER_GRACE_SECONDS = 0.05  # 线程发完一条命令后继续保留会话的时间，让其紧接着的命令不必再切换窗口
+MAX_BATCH_SECONDS = 2.0  # 一个线程连续占用会话的上限，超过后不再保留，其他窗口得以插入
+
+class WindowScheduler:
+    """
+    在同一个已登录的WebDriver会话中，用多个窗口并发执行互不依赖的子任务。
+    WebDriver会话同一时刻只能操作一个窗口，因此所有命令都串行发出；每个线程绑定自己的窗口，
+    轮到的线程若不是当前窗口的主人，会先切换过去并恢复该窗口的iframe层级。
+    为减少切换，线程发完一条命令后会短暂保留会话（OWNER_GRACE_SECONDS），使同一线程的连续命令成批执行；
+    切换窗口和恢复iframe的命令绕过统计钩子直接发出，只计入本调度器的 summary_lines()，不算到正在处理的页面上。
+    AI请求、sleep和WebDriverWait的轮询间隔都不占用会话，从而与其他窗口的DOM操作重叠；
+    但单条耗时长的命令（页面加载、单词卡片的异步翻卡脚本）执行期间所有窗口都要等待，
+    因此视频和单词卡片不参与并发，并发窗口也不用阻塞式的 driver.get 打开页面。
+    """
+    def __init__(self, driver, max_windows: int, log=print, page_types=CONCURRENT_PAGE_TYPES):
+        self.driver = driver; self.log = log; self.page_types = page_types
+        self._cond = threading.Condition()
+        self._busy, self._owner, self._owner_since, self._owner_until = False, None, 0.0, 0.0
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=max_windows, thread_name_prefix="window")
+        self._futures = []
+        self._raw_execute = driver.execute
+        self._bare_execute = lambda command, params=None: type(driver).execute(driver, command, params)  # 不经过统计钩子
+        self.switches, self.switch_time = 0, 0.0
+        self.main_handle = self._current_handle = driver.current_window_handle
+        self._frames = {self.main_handle: []}  # 窗口句柄 -> 当前iframe切换参数栈
+        driver.execute = self._execute
+
+    def accepts(self, page_type: str) -> bool: return page_type in self.page_types
+
+    @contextmanager
+    def _session(self):
+        """独占WebDriver会话；刚用完会话的线程在宽限期内优先，其他线程等待宽限期结束。"""
+        me = threading.get_ident()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if not self._busy and (self._owner in (None, me) or now >= self._owner_until): break
+                self._cond.wait(None if self._busy else self._owner_until - now)
+            if self._owner != me: self._owner, self._owner_since = me, now
+            self._busy = True
+        try: yield
+        finally:
+            with self._cond:
+                now = time.monotonic()
+                self._busy = False
+                self._owner_until = now + OWNER_GRACE_SECONDS if now - self._owner_since < MAX_BATCH_SECONDS else now
+                if now >= self._owner_until: self._owner = None
+                self._cond.notify_all()
+
+    def _execute(self, driver_command, params=None):
+        with self._session():
+            handle = getattr(self._local, 'handle', None) or self.main_handle
+            if driver_command == Command.SWITCH_TO_WINDOW:
+                result = self._raw_execute(driver_command, params)
+                self._current_handle = handle = params['handle']; self._frames[handle] = []
+                self._local.handle = handle
+                return result
+            if handle != self._current_handle: self._activate(handle)
+            result = self._raw_execute(driver_command, params)
+            if driver_command == Command.SWITCH_TO_FRAME:
+                if params.get('id') is None: self._frames[handle] = []
+                else: self._frames[handle].append(params)
+            elif driver_command == Command.SWITCH_TO_PARENT_FRAME and self._frames[handle]:
+                self._frames[handle].pop()
+            return result
+
+    def _activate(self, handle):
+        start = time.perf_counter()
+        try:
+            self._bare_execute(Command.SWITCH_TO_WINDOW, {'handle': handle})
+            for frame_params in self._frames.get(handle, []): self._bare_execute(Command.SWITCH_TO_FRAME, frame_params)
+            self._current_handle = handle
+        finally:
+            self.switches += 1; self.switch_time += time.perf_counter() - start
+
+    def submit(self, label: str, task, *args):
+        """在新窗口中执行 task(*args)；task 内对driver的所有操作都会自动落到这个窗口上。"""
+        self._futures.append((label, self._pool.submit(self._run_in_window, label, task, *args)))
+
+    def _run_in_window(self, label, task, *args):
+        with self._session():
+            handle = self._raw_execute(Command.NEW_WINDOW, {'type': 'tab'})['value']['handle']
+            self._frames[handle] = []
+        self._local.handle = handle
+        try:
+            return task(*args)
+        finally:
+            with self._session():
+                try:
+                    if self._current_handle != handle: self._activate(handle)
+                    self._raw_execute(Command.CLOSE)
+                except Exception as e: self.log(f"关闭并发窗口 '{label}' 时出错: {e}")
+                self._frames.pop(handle, None); self._current_handle = None
+            self._local.handle = None
+
+    def join(self) -> list:
+        """等待所有已提交的子任务结束，返回 [(标签, 结果或异常)]，并恢复driver的原始execute。"""
+        results = []
+        for label, future in self._futures:
+            try: results.append((label, future.result()))
+            except Exception as e: self.log(f"并发子任务 '{label}' 出错: {e}"); results.append((label, e))
+        self._futures = []
+        self._pool.shutdown()
+        with self._session():
+            self.driver.execute = self._raw_execute
+            if self._current_handle != self.main_handle: self._activate(self.main_handle)
+        return results
+
+    def summary_lines(self) -> list:
+        """生成运行摘要中的窗口切换统计（这些命令不计入各页面的WebDriver往返统计）。"""
+        if not self.switches: return []
+        return [f"并发窗口: 切换窗口 {self.switches} 次（含iframe恢复）, 通信 {self.switch_time:.2f}s"]